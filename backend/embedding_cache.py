@@ -0,0 +1,62 @@
+# embedding_cache.py
+import hashlib
+import json
+import sqlite3
+import threading
+from typing import Dict, Iterable, List, Tuple
+
+# Persistent cache of text embeddings keyed by (sha256(text), model name).
+# Re-uploading a CSV whose rows haven't changed then costs zero embedding
+# calls, which is by far the dominant ingest cost.
+
+CACHE_PATH = "./.emb_cache.sqlite"
+
+_SCHEMA = """
+CREATE TABLE IF NOT EXISTS embeddings (
+    text_hash TEXT NOT NULL,
+    model TEXT NOT NULL,
+    vector TEXT NOT NULL,
+    PRIMARY KEY (text_hash, model)
+)
+"""
+
+
+def text_hash(text: str) -> str:
+    return hashlib.sha256(text.encode("utf-8")).hexdigest()
+
+
+class EmbeddingCache:
+    """Tiny sqlite-backed embedding cache (WAL mode, thread-safe)."""
+
+    def __init__(self, path: str = CACHE_PATH):
+        self.conn = sqlite3.connect(path, check_same_thread=False)
+        self.lock = threading.Lock()
+        with self.lock:
+            self.conn.execute("PRAGMA journal_mode=WAL")
+            self.conn.execute(_SCHEMA)
+            self.conn.commit()
+
+    def get_many(self, hashes: Iterable[str], model: str) -> Dict[str, List[float]]:
+        hashes = list(hashes)
+        if not hashes:
+            return {}
+        placeholders = ",".join("?" * len(hashes))
+        with self.lock:
+            rows = self.conn.execute(
+                f"SELECT text_hash, vector FROM embeddings "
+                f"WHERE model = ? AND text_hash IN ({placeholders})",
+                [model, *hashes],
+            ).fetchall()
+        return {h: json.loads(vec) for h, vec in rows}
+
+    def put_many(self, pairs: Iterable[Tuple[str, List[float]]], model: str):
+        rows = [(h, model, json.dumps(vec)) for h, vec in pairs]
+        if not rows:
+            return
+        with self.lock:
+            self.conn.executemany(
+                "INSERT OR REPLACE INTO embeddings (text_hash, model, vector) "
+                "VALUES (?, ?, ?)",
+                rows,
+            )
+            self.conn.commit()
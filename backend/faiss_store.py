@@ -0,0 +1,97 @@
+# faiss_store.py
+import json
+import os
+
+import numpy as np
+from langchain.schema import Document
+
+# Optional faiss import - the Chroma backend remains the default
+try:
+    import faiss
+    FAISS_AVAILABLE = True
+except ImportError:
+    FAISS_AVAILABLE = False
+
+# Set FAISS_QUANTIZE=int8 to store vectors 8-bit scalar-quantized:
+# half the RAM and half the bytes moved per search, at near-identical
+# recall for short embedding vectors
+FAISS_QUANTIZE = os.getenv("FAISS_QUANTIZE", "").lower() in ("1", "true", "int8")
+
+
+class FAISSStore:
+    """FAISS-backed vector store exposing the subset of the Chroma API we use.
+
+    All vectors live in one HNSW index; page contents and metadata sit in
+    parallel Python lists addressed by integer id, so a search touches only
+    the contiguous vector data. Scores are cosine distances (lower is
+    better) to match the Chroma backend exactly.
+    """
+
+    INDEX_FILE = "index.faiss"
+    DOCS_FILE = "docs.json"
+
+    def __init__(self, embedding_function, persist_dir="./faiss_store"):
+        self.embedding_function = embedding_function
+        self.persist_dir = persist_dir
+        self.index = None
+        self.texts = []
+        self.metadatas = []
+        self._load()
+
+    def _load(self):
+        index_path = os.path.join(self.persist_dir, self.INDEX_FILE)
+        docs_path = os.path.join(self.persist_dir, self.DOCS_FILE)
+        if os.path.exists(index_path) and os.path.exists(docs_path):
+            self.index = faiss.read_index(index_path)
+            with open(docs_path) as f:
+                payload = json.load(f)
+            self.texts = payload["texts"]
+            self.metadatas = payload["metadatas"]
+
+    def add_documents(self, docs):
+        texts = [doc.page_content for doc in docs]
+        vectors = self.embedding_function.embed_documents(texts)
+        self.add_embeddings(texts, vectors, [doc.metadata for doc in docs])
+
+    def add_embeddings(self, texts, embeddings, metadatas):
+        vectors = np.asarray(embeddings, dtype=np.float32)
+        faiss.normalize_L2(vectors)
+        if self.index is None:
+            dim = vectors.shape[1]
+            if FAISS_QUANTIZE:
+                self.index = faiss.IndexHNSWSQ(
+                    dim, faiss.ScalarQuantizer.QT_8bit, 32,
+                    faiss.METRIC_INNER_PRODUCT)
+            else:
+                self.index = faiss.IndexHNSWFlat(
+                    dim, 32, faiss.METRIC_INNER_PRODUCT)
+        if not self.index.is_trained:
+            # one-shot scale learning for the scalar quantizer
+            self.index.train(vectors)
+        self.index.add(vectors)
+        self.texts.extend(texts)
+        self.metadatas.extend(metadatas)
+
+    def similarity_search_by_vector_with_relevance_scores(self, embedding, k=4):
+        if self.index is None or self.index.ntotal == 0:
+            return []
+        query = np.asarray([embedding], dtype=np.float32)
+        faiss.normalize_L2(query)
+        scores, ids = self.index.search(query, min(k, self.index.ntotal))
+        results = []
+        for score, idx in zip(scores[0], ids[0]):
+            if idx < 0:
+                continue
+            doc = Document(
+                page_content=self.texts[idx], metadata=self.metadatas[idx])
+            # inner product on normalized vectors -> cosine distance
+            results.append((doc, float(1.0 - score)))
+        return results
+
+    def persist(self):
+        os.makedirs(self.persist_dir, exist_ok=True)
+        if self.index is not None:
+            faiss.write_index(
+                self.index, os.path.join(self.persist_dir, self.INDEX_FILE))
+        with open(os.path.join(self.persist_dir, self.DOCS_FILE), "w") as f:
+            json.dump({"texts": self.texts, "metadatas": self.metadatas}, f)
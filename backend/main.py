@@ -1,26 +1,123 @@
 
+import functools
+import heapq
+import logging
+import logging.handlers
+import queue
+from itertools import islice
+
 from fastapi import FastAPI, File, HTTPException, UploadFile, Request
 from fastapi.middleware.cors import CORSMiddleware
+from fastapi.responses import ORJSONResponse
 from models import QueryRequest
+from starlette.concurrency import run_in_threadpool
 from slowapi import Limiter, _rate_limit_exceeded_handler
 from slowapi.util import get_remote_address
 from slowapi.errors import RateLimitExceeded
 
 import pandas as pd
-import io
 import json
 from dotenv import load_dotenv
-from vector_store import get_vectorstore, load_vectorstore
+from vector_store import (
+    add_documents_batched,
+    create_vectorstore,
+    embed_queries_cached,
+    load_vectorstore,
+)
 from utils import dataframe_to_documents, validate_csv_file, explain_relevance, sanitize_query_input
 from query_processor import QueryProcessor
 # from tagging import explain_classification  # Currently unused
 load_dotenv()  # Loads .env variables into os.environ
 
+# Queue-backed logging: handlers run on a background thread so request
+# handlers never block on stdout writes (print flushes synchronously
+# under the GIL, serializing concurrent requests)
+_log_queue = queue.SimpleQueue()
+_log_handler = logging.StreamHandler()
+_log_handler.setFormatter(
+    logging.Formatter("%(asctime)s %(levelname)s %(name)s: %(message)s"))
+_log_listener = logging.handlers.QueueListener(_log_queue, _log_handler)
+_log_listener.start()
+
+logger = logging.getLogger("app")
+logger.addHandler(logging.handlers.QueueHandler(_log_queue))
+logger.setLevel(logging.INFO)
+
+
+# orjson serializes the nested per-row response dicts several times
+# faster than the default json encoder and handles numpy scalars natively
+app = FastAPI(default_response_class=ORJSONResponse)
+
+
+@functools.lru_cache(maxsize=4096)
+def _parse_json_meta(raw: str):
+    """Decode a JSON metadata string, memoized on the raw string.
+
+    Rows sharing a schema carry identical categories/column-type JSON, so
+    caching the parsed value avoids re-decoding the same string per row.
+    Returns None on invalid input so callers can supply their own default.
+    """
+    try:
+        return json.loads(raw)
+    except (json.JSONDecodeError, TypeError):
+        return None
+
+
+# Rows ingested per chunk: caps peak memory at one chunk's worth of
+# DataFrame + Documents while keeping embedding batches large.
+UPLOAD_CHUNK_ROWS = 5000
+
+
+def _ingest_csv(csv_file):
+    """Parse and index a CSV in fixed-size chunks.
+
+    Streaming through pd.read_csv(chunksize=...) means we never hold the
+    full DataFrame or the full Document list in memory; each chunk is
+    embedded and added to the store before the next one is parsed.
+    Returns (vectordb, num_rows, columns, preview); the store is handed
+    back so the caller can install it as the serving instance.
+    """
+    vectordb = create_vectorstore()
+    num_rows = 0
+    columns = []
+    preview = []
+
+    reader = pd.read_csv(
+        csv_file, engine="c", low_memory=False, chunksize=UPLOAD_CHUNK_ROWS)
+    for chunk in reader:
+        if not columns:
+            columns = chunk.columns.tolist()
+            preview = chunk.head().to_dict(orient="records")
+        docs = dataframe_to_documents(chunk)
+        add_documents_batched(vectordb, docs)
+        num_rows += len(chunk)
+
+    vectordb.persist()
+    return vectordb, num_rows, columns, preview
+
+
+@app.on_event("startup")
+async def open_vectorstore():
+    # Open the persisted Chroma index once; reopening it per query pays
+    # the sqlite/HNSW open cost on every request for no benefit.
+    app.state.vectordb = await run_in_threadpool(load_vectorstore)
+
+def _rate_limit_key(request: Request) -> str:
+    """Resolve the client address once per request and reuse it.
+
+    slowapi calls the key func for every limited route; caching on
+    request.state means X-Forwarded-For parsing happens a single time
+    no matter how many consumers ask for the client key.
+    """
+    key = getattr(request.state, "client_key", None)
+    if key is None:
+        key = get_remote_address(request)
+        request.state.client_key = key
+    return key
 
-app = FastAPI()
 
 # Initialize rate limiter
-limiter = Limiter(key_func=get_remote_address)
+limiter = Limiter(key_func=_rate_limit_key)
 app.state.limiter = limiter
 app.add_exception_handler(RateLimitExceeded, _rate_limit_exceeded_handler)
 
@@ -48,23 +145,21 @@ async def upload_csv(request: Request, file: UploadFile = File(...)):
         # File validation
         await validate_csv_file(file)
 
-        contents = await file.read()
-        print(f"Uploading file: {file.filename}")
+        logger.info("Uploading file: %s", file.filename)
 
-        df = pd.read_csv(io.StringIO(contents.decode("utf-8")))
-        # Create searchable documents
-        docs = dataframe_to_documents(df)
+        # Parse and index straight from the spooled upload file in a
+        # worker thread: chunked, so peak memory is one chunk regardless
+        # of upload size, and the event loop stays free throughout.
+        vectordb, num_rows, columns, preview = await run_in_threadpool(
+            _ingest_csv, file.file)
 
-        # Create vector store
-        get_vectorstore(docs)
-
-        # Preview first 5 rows as a list of dicts
-        preview = df.head().to_dict(orient="records")
+        # Swap the freshly built store in as the serving instance
+        request.app.state.vectordb = vectordb
 
         return {
             "filename": file.filename,
-            "num_rows": len(df),
-            "columns": df.columns.tolist(),
+            "num_rows": num_rows,
+            "columns": columns,
             "preview": preview,
         }
     except HTTPException:
@@ -80,53 +175,59 @@ async def query_spreadsheet(request: Request, query: QueryRequest):
         # Sanitize query input for security
         sanitized_question = sanitize_query_input(query.question)
 
-        vectordb = load_vectorstore()  # reload persisted Chroma index
+        vectordb = request.app.state.vectordb  # opened once at startup
 
         # Process query using intelligent query understanding
-        query_analysis = query_processor.process_query(sanitized_question)
+        query_analysis = await run_in_threadpool(
+            query_processor.process_query, sanitized_question)
 
         # Get initial results with expanded search terms
         all_results = []
-        search_terms = [sanitized_question] + \
-            query_analysis.get('expanded_terms', [])
+        search_terms = [sanitized_question, *query_analysis.expanded_terms]
 
         # Search with original query and expanded terms
-        # Limit to avoid too many searches
-        for search_term in search_terms[:3]:
-            results = vectordb.similarity_search_with_score(
-                search_term, k=query.k * 2)
+        # Limit to avoid too many searches; embed all terms in one call
+        unique_terms = list(dict.fromkeys(search_terms))[:3]
+        term_vectors = await run_in_threadpool(embed_queries_cached, unique_terms)
+        for term_vector in term_vectors:
+            results = await run_in_threadpool(
+                vectordb.similarity_search_by_vector_with_relevance_scores,
+                term_vector, k=query.k * 2)
             all_results.extend(results)
 
-        # Remove duplicates based on row_index
-        unique_results = {}
+        # Remove duplicates based on row_index, keeping the best score
+        best_results = {}
         for doc, score in all_results:
             row_index = doc.metadata.get("row_index")
-            if row_index not in unique_results or score < unique_results[row_index][1]:
-                unique_results[row_index] = (doc, score)
+            current = best_results.get(row_index)
+            if current is None or score < current[1]:
+                best_results[row_index] = (doc, score)
+
+        processing_result = query_analysis.processing_result
+        filter_categories = processing_result.filter_categories
 
-        # Convert back to list and sort by score
-        filtered_results = list(unique_results.values())
-        # Sort by score (lower is better)
-        filtered_results.sort(key=lambda x: x[1])
+        # Select by score (lower is better). When no category filter runs we
+        # only ever return query.k results, so an O(n log k) partial sort
+        # beats sorting the whole fan-out.
+        n_needed = len(best_results) if filter_categories else query.k
+        filtered_results = heapq.nsmallest(
+            n_needed, best_results.values(), key=lambda x: x[1])
 
         # Apply category-based filtering if applicable
-        processing_result = query_analysis.get('processing_result', {})
-        filter_categories = processing_result.get('filter_categories', [])
 
         if filter_categories:
-            # Filter results based on business categories
-            category_filtered = []
-            for doc, score in filtered_results:
-                # Parse JSON string back to list for categories
-                categories_json = doc.metadata.get('categories_json', '[]')
-                try:
-                    doc_categories = json.loads(
-                        categories_json) if categories_json else []
-                except (json.JSONDecodeError, TypeError):
-                    doc_categories = []
-
-                if any(cat in doc_categories for cat in filter_categories):
-                    category_filtered.append((doc, score))
+            # Filter results based on business categories. A frozenset makes
+            # each membership test O(1), and since filtered_results is
+            # already score-ascending we can stop scanning as soon as
+            # query.k matches are in hand.
+            filter_set = frozenset(filter_categories)
+            matches = (
+                (doc, score) for doc, score in filtered_results
+                if not filter_set.isdisjoint(
+                    _parse_json_meta(
+                        doc.metadata.get('categories_json', '[]')) or [])
+            )
+            category_filtered = list(islice(matches, query.k))
 
             # If category filtering returns results, use them; otherwise fall back to all results
             if category_filtered:
@@ -140,17 +241,11 @@ async def query_spreadsheet(request: Request, query: QueryRequest):
         for doc, score in final_results:
             metadata = doc.metadata
 
-            # Parse JSON metadata back to objects
-            try:
-                categories = json.loads(metadata.get('categories_json', '[]'))
-            except (json.JSONDecodeError, TypeError):
-                categories = []
-
-            try:
-                column_types = json.loads(
-                    metadata.get('column_types_json', '{}'))
-            except (json.JSONDecodeError, TypeError):
-                column_types = {}
+            # Parse JSON metadata back to objects (memoized across rows)
+            categories = _parse_json_meta(
+                metadata.get('categories_json', '[]')) or []
+            column_types = _parse_json_meta(
+                metadata.get('column_types_json', '{}')) or {}
 
             classification_explanation = metadata.get(
                 'classification_explanation', '')
@@ -169,10 +264,10 @@ async def query_spreadsheet(request: Request, query: QueryRequest):
             "results": response,
             "query_analysis": {
                 "original_query": query.question,
-                "query_type": query_analysis.get('categorization', {}).get('primary_category', 'unknown'),
-                "confidence": query_analysis.get('categorization', {}).get('confidence', 0),
-                "extracted_concepts": query_analysis.get('extracted_concepts', []),
-                "search_strategy": processing_result.get('search_strategy', 'semantic_similarity')
+                "query_type": query_analysis.categorization.primary_category,
+                "confidence": query_analysis.categorization.confidence,
+                "extracted_concepts": list(query_analysis.extracted_concepts),
+                "search_strategy": processing_result.search_strategy
             },
             "total_results_found": len(response)
         }
@@ -0,0 +1,89 @@
+# memory_store.py
+import json
+import os
+
+import numpy as np
+from langchain.schema import Document
+
+from cosine_kernel import topk_inner
+
+
+def _normalize(vectors):
+    norms = np.linalg.norm(vectors, axis=1, keepdims=True)
+    return vectors / np.maximum(norms, 1e-12)
+
+
+class InMemoryStore:
+    """NumPy-backed vector store for small corpora.
+
+    Keeps every vector in one contiguous float32 (N, d) matrix with page
+    contents and metadata in parallel lists, so a search is a single
+    matrix-vector product plus an argpartition top-k — no database or
+    index overhead at all. Scores are cosine distances (lower is better)
+    to match the other backends.
+    """
+
+    VECTORS_FILE = "vectors.npy"
+    DOCS_FILE = "docs.json"
+
+    def __init__(self, embedding_function, persist_dir="./memory_store"):
+        self.embedding_function = embedding_function
+        self.persist_dir = persist_dir
+        self.matrix = None
+        self.texts = []
+        self.metadatas = []
+        self._dirty = False
+        self._load()
+
+    def _load(self):
+        vectors_path = os.path.join(self.persist_dir, self.VECTORS_FILE)
+        docs_path = os.path.join(self.persist_dir, self.DOCS_FILE)
+        if os.path.exists(vectors_path) and os.path.exists(docs_path):
+            # mmap keeps startup cheap; pages fault in on first search
+            self.matrix = np.load(vectors_path, mmap_mode="r")
+            with open(docs_path) as f:
+                payload = json.load(f)
+            self.texts = payload["texts"]
+            self.metadatas = payload["metadatas"]
+
+    def add_documents(self, docs):
+        texts = [doc.page_content for doc in docs]
+        vectors = self.embedding_function.embed_documents(texts)
+        self.add_embeddings(texts, vectors, [doc.metadata for doc in docs])
+
+    def add_embeddings(self, texts, embeddings, metadatas):
+        # normalize once at ingest; every later search is then a pure
+        # inner product instead of a full cosine
+        vectors = _normalize(np.asarray(embeddings, dtype=np.float32))
+        if self.matrix is None:
+            self.matrix = vectors
+        else:
+            self.matrix = np.vstack([self.matrix, vectors])
+        self.texts.extend(texts)
+        self.metadatas.extend(metadatas)
+        self._dirty = True
+
+    def similarity_search_by_vector_with_relevance_scores(self, embedding, k=4):
+        if self.matrix is None or len(self.texts) == 0:
+            return []
+        query = np.asarray(embedding, dtype=np.float32)
+        query /= max(float(np.linalg.norm(query)), 1e-12)
+        scores, ids = topk_inner(query, self.matrix, min(k, len(self.texts)))
+        return [
+            (Document(page_content=self.texts[i], metadata=self.metadatas[i]),
+             float(1.0 - score))
+            for score, i in zip(scores, ids)
+        ]
+
+    def persist(self):
+        # Only rewrite when something was added since _load(): an untouched
+        # store still holds the read-only memmap of vectors.npy, and saving
+        # over that path would truncate the file out from under the mapping
+        if self.matrix is None or not self._dirty:
+            return
+        os.makedirs(self.persist_dir, exist_ok=True)
+        np.save(os.path.join(self.persist_dir, self.VECTORS_FILE),
+                np.ascontiguousarray(self.matrix))
+        with open(os.path.join(self.persist_dir, self.DOCS_FILE), "w") as f:
+            json.dump({"texts": self.texts, "metadatas": self.metadatas}, f)
+        self._dirty = False
@@ -1,8 +1,12 @@
-from pydantic import BaseModel
+from pydantic import BaseModel, ConfigDict
 from typing import List, Dict, Any, Optional
 
 
 class QueryRequest(BaseModel):
+    # frozen + extra="forbid" keeps validation on pydantic v2's fast
+    # path: no extra-attribute scan and no mutable-instance bookkeeping
+    model_config = ConfigDict(extra="forbid", frozen=True)
+
     question: str
     k: int = 5
 
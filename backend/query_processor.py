@@ -1,187 +1,398 @@
 # query_processor.py
+from dataclasses import dataclass
 from typing import Dict, List, Tuple
+import functools
 import re
+import sys
 from tagging import BUSINESS_TERMS, get_business_concept_hierarchy
 
+# Optional Aho-Corasick import - the substring-scan path is the fallback
+try:
+    import ahocorasick
+    AHOCORASICK_AVAILABLE = True
+except ImportError:
+    AHOCORASICK_AVAILABLE = False
+
+# Optional third-party regex engine: drop-in for the stdlib syntax we
+# use, with a matcher that short-circuits alternation-heavy patterns
+# faster on non-matching input (the common case for categorization)
+try:
+    import regex as _re_engine
+except ImportError:
+    _re_engine = re
+
+# Keyword sets for the functional/comparative processors: tokenizing the
+# query once and probing these is O(1) per check instead of a substring
+# scan per keyword (and 'if' no longer matches inside words like 'shift')
+_TOKENIZE = _re_engine.compile(r'[a-z%]+').findall
+_PERCENTAGE_TOKENS = frozenset({'percentage', 'percent', '%'})
+_AVERAGE_TOKENS = frozenset({'average', 'mean'})
+_SUM_TOKENS = frozenset({'sum', 'total', 'add'})
+_LOOKUP_TOKENS = frozenset({'vlookup', 'lookup', 'index', 'match'})
+_CONDITIONAL_TOKENS = frozenset({'if', 'conditional', 'condition'})
+_PLANNING_TOKENS = frozenset({'budget', 'actual', 'forecast', 'target'})
+_TEMPORAL_TOKENS = frozenset({'time', 'trend', 'historical', 'series'})
+_BENCHMARK_TOKENS = frozenset({'benchmark', 'industry', 'peer', 'standard'})
+
+# Interned category names: dict probes and dispatch comparisons on these
+# become pointer compares instead of character-by-character ones
+_CONCEPTUAL = sys.intern('conceptual')
+_FUNCTIONAL = sys.intern('functional')
+_COMPARATIVE = sys.intern('comparative')
+
+# Constant result pieces, built once at import instead of per call
+_COMPARATIVE_FILTER_CATEGORIES = (
+    'planning_metrics', 'time_series', 'benchmark_analysis')
+_FORMULA_CATEGORY = {
+    'percentage': 'formula_percentage',
+    'aggregation': 'formula_aggregation',
+    'lookup': 'formula_lookup',
+    'conditional': 'formula_conditional',
+}
+
+
+# Slotted frozen dataclasses for the pipeline results: fixed-offset
+# attribute access and far less allocation/GC churn than the per-call
+# string-keyed dicts they replace
+@dataclass(slots=True, frozen=True)
+class Categorization:
+    primary_category: str
+    confidence: float
+    scores: Dict[str, int]
+    is_hybrid: bool
+
+
+@dataclass(slots=True, frozen=True)
+class ProcessingResult:
+    type: str
+    search_strategy: str
+    filter_categories: Tuple[str, ...]
+    target_concepts: Tuple[str, ...] = ()
+    related_concepts: Tuple[str, ...] = ()
+    function_types: Tuple[str, ...] = ()
+    comparison_types: Tuple[str, ...] = ()
+
+
+@dataclass(slots=True, frozen=True)
+class ProcessedQuery:
+    original_query: str
+    categorization: Categorization
+    extracted_concepts: Tuple[str, ...]
+    expanded_terms: Tuple[str, ...]
+    processing_result: ProcessingResult
+
+
 class QueryProcessor:
     """Processes and categorizes natural language queries for semantic search."""
-    
+
+    # Slots instead of a per-instance __dict__: attribute reads in the hot
+    # methods resolve to fixed offsets
+    __slots__ = (
+        'conceptual_patterns', 'functional_patterns', 'comparative_patterns',
+        '_conceptual_re', '_functional_re', '_comparative_re',
+        '_concept_patterns', '_token_concepts', '_phrase_concepts',
+        '_term_automaton', '_syn_map', '_syn_re', '_related_concepts',
+        '_process_query_cached',
+    )
+
     def __init__(self):
+        # All inner groups are non-capturing: the scorer only needs to know
+        # whether a pattern matched, and dropping capture bookkeeping keeps
+        # the fused alternation's group table down to one name per pattern.
         self.conceptual_patterns = [
-            r'\b(find|show|get|search)\s+(all\s+)?(profitability|revenue|cost|growth|efficiency|margin|profit)',
-            r'\b(where\s+are|locate)\s+(my\s+)?(.+\s+)?(metrics|calculations|ratios|analyses)',
-            r'\b(profitability|revenue|cost|growth|efficiency)\s+(metrics|data|calculations)',
+            r'\b(?:find|show|get|search)\s+(?:all\s+)?(?:profitability|revenue|cost|growth|efficiency|margin|profit)',
+            r'\b(?:where\s+are|locate)\s+(?:my\s+)?(?:.+\s+)?(?:metrics|calculations|ratios|analyses)',
+            r'\b(?:profitability|revenue|cost|growth|efficiency)\s+(?:metrics|data|calculations)',
         ]
-        
+
         self.functional_patterns = [
-            r'\b(percentage|average|sum|count|conditional|lookup)\s+(calculations|formulas)',
-            r'\b(show|find|get)\s+(formulas|calculations)\s+(that|with)',
-            r'\b(vlookup|index|match|if|sumif|countif|average|sum)\s+(formulas|functions)',
+            r'\b(?:percentage|average|sum|count|conditional|lookup)\s+(?:calculations|formulas)',
+            r'\b(?:show|find|get)\s+(?:formulas|calculations)\s+(?:that|with)',
+            r'\b(?:vlookup|index|match|if|sumif|countif|average|sum)\s+(?:formulas|functions)',
         ]
-        
+
         self.comparative_patterns = [
-            r'\b(budget\s+vs\s+actual|actual\s+vs\s+budget)',
-            r'\b(time\s+series|monthly|quarterly|yearly|historical)',
-            r'\b(compare|comparison|versus|vs|against)',
-            r'\b(trend|progression|change\s+over\s+time)',
-            r'\b(benchmark|industry\s+standard|peer\s+analysis)',
+            r'\b(?:budget\s+vs\s+actual|actual\s+vs\s+budget)',
+            r'\b(?:time\s+series|monthly|quarterly|yearly|historical)',
+            r'\b(?:compare|comparison|versus|vs|against)',
+            r'\b(?:trend|progression|change\s+over\s+time)',
+            r'\b(?:benchmark|industry\s+standard|peer\s+analysis)',
         ]
-    
-    def categorize_query(self, query: str) -> Dict[str, any]:
-        """Categorize query into conceptual, functional, or comparative type."""
-        query_lower = query.lower()
-        
-        # Check for conceptual queries
-        conceptual_score = sum(1 for pattern in self.conceptual_patterns 
-                             if re.search(pattern, query_lower))
-        
-        # Check for functional queries  
-        functional_score = sum(1 for pattern in self.functional_patterns
-                             if re.search(pattern, query_lower))
-        
-        # Check for comparative queries
-        comparative_score = sum(1 for pattern in self.comparative_patterns
-                              if re.search(pattern, query_lower))
-        
-        # Determine primary category
-        scores = {
-            'conceptual': conceptual_score,
-            'functional': functional_score, 
-            'comparative': comparative_score
+
+        # Fuse each category's patterns into a single alternation with one
+        # named group per original pattern: categorization then costs one
+        # engine pass per category instead of one per pattern
+        self._conceptual_re = self._fuse_patterns('c', self.conceptual_patterns)
+        self._functional_re = self._fuse_patterns('f', self.functional_patterns)
+        self._comparative_re = self._fuse_patterns('m', self.comparative_patterns)
+        self._concept_patterns = {
+            concept: [_re_engine.compile(p) for p in terms['patterns']]
+            for concept, terms in BUSINESS_TERMS.items()
         }
-        
-        primary_category = max(scores, key=scores.get)
-        confidence = max(scores.values()) / sum(scores.values()) if sum(scores.values()) > 0 else 0
-        
-        return {
-            'primary_category': primary_category,
-            'confidence': confidence,
-            'scores': scores,
-            'is_hybrid': sum(v > 0 for v in scores.values()) > 1
+
+        # Inverted index over every primary term and synonym: single-word
+        # terms become a token -> concepts dict probe, multi-word terms a
+        # short substring list. Per-query cost then scales with the query,
+        # not with how large BUSINESS_TERMS grows.
+        term_concepts = {}
+        for concept, terms in BUSINESS_TERMS.items():
+            for term in terms['primary'] + terms['synonyms']:
+                term_concepts.setdefault(term, set()).add(concept)
+        self._token_concepts = {
+            term: frozenset(concepts)
+            for term, concepts in term_concepts.items() if ' ' not in term
         }
-    
-    def extract_business_concepts(self, query: str) -> List[str]:
-        """Extract relevant business concepts from query."""
-        query_lower = query.lower()
-        concepts = []
-        
-        # Check against business terms dictionary
+        self._phrase_concepts = [
+            (term, frozenset(concepts))
+            for term, concepts in term_concepts.items() if ' ' in term
+        ]
+
+        # Aho-Corasick automaton over the same terms: one linear pass over
+        # the query finds all dictionary hits at once, including terms
+        # embedded in longer words
+        self._term_automaton = None
+        if AHOCORASICK_AVAILABLE:
+            automaton = ahocorasick.Automaton()
+            for term, concepts in term_concepts.items():
+                automaton.add_word(term, tuple(concepts))
+            automaton.make_automaton()
+            self._term_automaton = automaton
+
+        # One alternation over every primary term plus a term -> synonyms
+        # map: expansion then costs a single scan of the query instead of
+        # a substring check per primary term in the dictionary. Longest
+        # terms first so multi-word primaries win over their prefixes.
+        syn_map = {}
         for concept, terms in BUSINESS_TERMS.items():
-            # Check primary terms
-            if any(term in query_lower for term in terms['primary']):
-                concepts.append(concept)
-            # Check synonyms
-            elif any(synonym in query_lower for synonym in terms['synonyms']):
-                concepts.append(concept)
-            # Check patterns
-            elif any(re.search(pattern, query_lower) for pattern in terms['patterns']):
-                concepts.append(concept)
+            for term in terms['primary']:
+                syn_map.setdefault(term, []).extend(terms['synonyms'])
+        self._syn_map = {term: tuple(syns) for term, syns in syn_map.items()}
+        self._syn_re = _re_engine.compile(r'\b(?:' + '|'.join(
+            sorted(map(re.escape, syn_map), key=len, reverse=True)) + r')\b')
+
+        # Reverse index over the concept hierarchy: each concept maps
+        # straight to its group members, so conceptual queries do dict
+        # hits instead of walking every group per call
+        self._related_concepts = {}
+        for group in get_business_concept_hierarchy().values():
+            for concept in group:
+                self._related_concepts.setdefault(concept, set()).update(group)
+
+        # Per-instance memoization of the full pipeline (the processor is
+        # stateless after __init__, so caching is safe)
+        self._process_query_cached = functools.lru_cache(maxsize=1024)(
+            self._process_query_uncached)
+
+    @staticmethod
+    def _fuse_patterns(tag: str, patterns: List[str]):
+        """Combine patterns into one alternation, one named group each."""
+        return _re_engine.compile('|'.join(
+            f'(?P<{tag}{i}>{p})' for i, p in enumerate(patterns)))
+
+    @staticmethod
+    def _count_pattern_hits(fused, query_lower: str) -> int:
+        """Count how many of the fused patterns matched, in one scan."""
+        hits = set()
+        for match in fused.finditer(query_lower):
+            hits.add(match.lastgroup)
+        return len(hits)
+
+    def categorize_query(self, query: str) -> Categorization:
+        """Categorize query into conceptual, functional, or comparative type."""
+        return self._categorize_lower(query.lower())
+
+    def _categorize_lower(self, query_lower: str) -> Categorization:
+        # One fused scan per category
+        conceptual_score = self._count_pattern_hits(
+            self._conceptual_re, query_lower)
+        functional_score = self._count_pattern_hits(
+            self._functional_re, query_lower)
+        comparative_score = self._count_pattern_hits(
+            self._comparative_re, query_lower)
         
-        return list(set(concepts))
+        # Determine primary category: one direct comparison chain instead
+        # of max(scores, key=scores.get) + max(values) + sum(values), which
+        # walked the dict three times with a Python callback per element.
+        # Ties resolve conceptual > functional > comparative, matching the
+        # old insertion-order max().
+        if conceptual_score >= functional_score and conceptual_score >= comparative_score:
+            primary_category, best = _CONCEPTUAL, conceptual_score
+        elif functional_score >= comparative_score:
+            primary_category, best = _FUNCTIONAL, functional_score
+        else:
+            primary_category, best = _COMPARATIVE, comparative_score
+
+        total = conceptual_score + functional_score + comparative_score
+
+        return Categorization(
+            primary_category=primary_category,
+            confidence=best / total if total > 0 else 0,
+            scores={
+                _CONCEPTUAL: conceptual_score,
+                _FUNCTIONAL: functional_score,
+                _COMPARATIVE: comparative_score,
+            },
+            is_hybrid=(conceptual_score > 0) + (functional_score > 0)
+                      + (comparative_score > 0) > 1,
+        )
+    
+    def extract_business_concepts(self, query: str) -> frozenset:
+        """Extract relevant business concepts from query."""
+        return self._extract_concepts_lower(query.lower())
+
+    def _extract_concepts_lower(self, query_lower: str) -> frozenset:
+        concepts = set()
+
+        if self._term_automaton is not None:
+            # Single automaton pass over the query collects every term hit
+            for _, term_concepts in self._term_automaton.iter(query_lower):
+                concepts.update(term_concepts)
+            # Regex-only patterns still cover what the word lists miss
+            for concept, patterns in self._concept_patterns.items():
+                if concept not in concepts and any(
+                        pattern.search(query_lower) for pattern in patterns):
+                    concepts.add(concept)
+            return frozenset(concepts)
+
+        # Fallback: probe the inverted index instead of scanning every
+        # BUSINESS_TERMS entry against the query
+        token_concepts = self._token_concepts
+        for token in _TOKENIZE(query_lower):
+            hit = token_concepts.get(token)
+            if hit:
+                concepts.update(hit)
+        for phrase, phrase_concepts in self._phrase_concepts:
+            if not phrase_concepts <= concepts and phrase in query_lower:
+                concepts.update(phrase_concepts)
+        # Pattern backstop for concepts the word lists didn't hit
+        for concept, patterns in self._concept_patterns.items():
+            if concept not in concepts and any(
+                    pattern.search(query_lower) for pattern in patterns):
+                concepts.add(concept)
+
+        return frozenset(concepts)
     
     def expand_query_terms(self, query: str) -> List[str]:
         """Expand query with business synonyms and related terms."""
-        query_lower = query.lower()
+        return self._expand_terms_lower(query, query.lower())
+
+    def _expand_terms_lower(self, query: str, query_lower: str) -> List[str]:
         expanded_terms = [query]
-        
-        # Add business synonyms
-        for concept, terms in BUSINESS_TERMS.items():
-            for term in terms['primary']:
-                if term in query_lower:
-                    # Add synonyms for this term
-                    for synonym in terms['synonyms']:
-                        if synonym not in query_lower:
-                            expanded_terms.append(query_lower.replace(term, synonym))
-        
+
+        # Single scan finds every primary term; each yields one variant
+        # per synonym the query doesn't already contain
+        seen = set()
+        for match in self._syn_re.finditer(query_lower):
+            term = match.group(0)
+            if term in seen:
+                continue
+            seen.add(term)
+            for synonym in self._syn_map[term]:
+                if synonym not in query_lower:
+                    expanded_terms.append(query_lower.replace(term, synonym))
+
         return expanded_terms
     
-    def process_conceptual_query(self, query: str, concepts: List[str]) -> Dict[str, any]:
+    def process_conceptual_query(self, query: str, concepts) -> ProcessingResult:
         """Process conceptual queries with business domain knowledge."""
-        hierarchy = get_business_concept_hierarchy()
-        
-        # Find related concepts in hierarchy
-        related_concepts = []
-        for main_concept, sub_concepts in hierarchy.items():
-            if any(concept in sub_concepts for concept in concepts):
-                related_concepts.extend(sub_concepts)
-        
-        return {
-            'type': 'conceptual',
-            'target_concepts': concepts,
-            'related_concepts': list(set(related_concepts)),
-            'search_strategy': 'semantic_similarity',
-            'filter_categories': concepts + related_concepts
-        }
+        # Find related concepts via the precomputed reverse index
+        related = set()
+        for concept in concepts:
+            related.update(self._related_concepts.get(concept, ()))
+        target_concepts = tuple(sorted(concepts))
+        related_concepts = tuple(sorted(related))
+
+        return ProcessingResult(
+            type=_CONCEPTUAL,
+            search_strategy='semantic_similarity',
+            filter_categories=target_concepts + related_concepts,
+            target_concepts=target_concepts,
+            related_concepts=related_concepts,
+        )
     
-    def process_functional_query(self, query: str) -> Dict[str, any]:
+    def process_functional_query(self, query: str) -> ProcessingResult:
         """Process functional queries focusing on formulas and calculations."""
-        query_lower = query.lower()
-        
+        return self._process_functional_lower(query.lower())
+
+    def _process_functional_lower(self, query_lower: str) -> ProcessingResult:
+        tokens = frozenset(_TOKENIZE(query_lower))
+
         # Extract function types
         function_types = []
-        if any(term in query_lower for term in ['percentage', '%', 'percent']):
+        if not _PERCENTAGE_TOKENS.isdisjoint(tokens):
             function_types.append('percentage')
-        if any(term in query_lower for term in ['average', 'mean']):
-            function_types.append('aggregation')
-        if any(term in query_lower for term in ['sum', 'total', 'add']):
+        if not _AVERAGE_TOKENS.isdisjoint(tokens) or not _SUM_TOKENS.isdisjoint(tokens):
             function_types.append('aggregation')
-        if any(term in query_lower for term in ['vlookup', 'lookup', 'index', 'match']):
+        if not _LOOKUP_TOKENS.isdisjoint(tokens):
             function_types.append('lookup')
-        if any(term in query_lower for term in ['if', 'conditional', 'condition']):
+        if not _CONDITIONAL_TOKENS.isdisjoint(tokens):
             function_types.append('conditional')
         
-        return {
-            'type': 'functional',
-            'function_types': function_types,
-            'search_strategy': 'formula_analysis',
-            'filter_categories': ['formula_' + ft for ft in function_types]
-        }
+        return ProcessingResult(
+            type=_FUNCTIONAL,
+            search_strategy='formula_analysis',
+            filter_categories=tuple(
+                _FORMULA_CATEGORY[ft] for ft in function_types),
+            function_types=tuple(function_types),
+        )
     
-    def process_comparative_query(self, query: str) -> Dict[str, any]:
+    def process_comparative_query(self, query: str) -> ProcessingResult:
         """Process comparative queries for analysis and benchmarking."""
-        query_lower = query.lower()
-        
+        return self._process_comparative_lower(query.lower())
+
+    def _process_comparative_lower(self, query_lower: str) -> ProcessingResult:
+        tokens = frozenset(_TOKENIZE(query_lower))
+
         comparison_types = []
-        if any(term in query_lower for term in ['budget', 'actual', 'forecast', 'target']):
+        if not _PLANNING_TOKENS.isdisjoint(tokens):
             comparison_types.append('planning')
-        if any(term in query_lower for term in ['time', 'trend', 'historical', 'series']):
+        if not _TEMPORAL_TOKENS.isdisjoint(tokens):
             comparison_types.append('temporal')
-        if any(term in query_lower for term in ['benchmark', 'industry', 'peer', 'standard']):
+        if not _BENCHMARK_TOKENS.isdisjoint(tokens):
             comparison_types.append('benchmark')
         
-        return {
-            'type': 'comparative',
-            'comparison_types': comparison_types,
-            'search_strategy': 'contextual_analysis',
-            'filter_categories': ['planning_metrics', 'time_series', 'benchmark_analysis']
-        }
+        return ProcessingResult(
+            type=_COMPARATIVE,
+            search_strategy='contextual_analysis',
+            filter_categories=_COMPARATIVE_FILTER_CATEGORIES,
+            comparison_types=tuple(comparison_types),
+        )
     
-    def process_query(self, query: str) -> Dict[str, any]:
-        """Main query processing pipeline."""
+    def process_query(self, query: str) -> ProcessedQuery:
+        """Main query processing pipeline.
+
+        The pipeline is deterministic in the query string, so results are
+        memoized — a repeated question skips every regex scan. Callers
+        must treat the returned structure as read-only.
+        """
+        return self._process_query_cached(query)
+
+    def _process_query_uncached(self, query: str) -> ProcessedQuery:
+        # Lowercase once; every step below shares the same string
+        query_lower = query.lower()
+
         # Step 1: Categorize query
-        categorization = self.categorize_query(query)
-        
+        categorization = self._categorize_lower(query_lower)
+
         # Step 2: Extract business concepts
-        concepts = self.extract_business_concepts(query)
-        
+        concepts = self._extract_concepts_lower(query_lower)
+
         # Step 3: Expand query terms
-        expanded_terms = self.expand_query_terms(query)
-        
+        expanded_terms = self._expand_terms_lower(query, query_lower)
+
         # Step 4: Process based on category
-        if categorization['primary_category'] == 'conceptual':
-            processing_result = self.process_conceptual_query(query, concepts)
-        elif categorization['primary_category'] == 'functional':
-            processing_result = self.process_functional_query(query)
-        elif categorization['primary_category'] == 'comparative':
-            processing_result = self.process_comparative_query(query)
+        if categorization.primary_category == _FUNCTIONAL:
+            processing_result = self._process_functional_lower(query_lower)
+        elif categorization.primary_category == _COMPARATIVE:
+            processing_result = self._process_comparative_lower(query_lower)
         else:
-            # Default to conceptual if unclear
+            # Conceptual, or default to conceptual if unclear
             processing_result = self.process_conceptual_query(query, concepts)
         
-        return {
-            'original_query': query,
-            'categorization': categorization,
-            'extracted_concepts': concepts,
-            'expanded_terms': expanded_terms,
-            'processing_result': processing_result
-        }
\ No newline at end of file
+        return ProcessedQuery(
+            original_query=query,
+            categorization=categorization,
+            extracted_concepts=tuple(sorted(concepts)),
+            expanded_terms=tuple(expanded_terms),
+            processing_result=processing_result,
+        )
\ No newline at end of file
@@ -1,7 +1,15 @@
 # tagging.py
-from typing import List, Dict, Set
+from typing import List, Dict, Set, Tuple
+import functools
 import re
 
+# Optional Aho-Corasick import - the per-term substring scan is the fallback
+try:
+    import ahocorasick
+    AHOCORASICK_AVAILABLE = True
+except ImportError:
+    AHOCORASICK_AVAILABLE = False
+
 # Business term dictionaries for comprehensive classification
 BUSINESS_TERMS = {
     'profitability': {
@@ -51,6 +59,12 @@ FORMULA_FUNCTIONS = {
     'date': ['today', 'now', 'year', 'month', 'day', 'date']
 }
 
+# Frozen lowercase views for O(1) membership checks in classify_by_formula
+_FORMULA_FUNCTIONS_LOWER = {
+    category: frozenset(functions)
+    for category, functions in FORMULA_FUNCTIONS.items()
+}
+
 # Business context patterns for better classification
 CONTEXT_PATTERNS = {
     'time_series': [r'\b(q[1-4]|quarter|yr\d+|year|monthly|annual)\b'],
@@ -59,53 +73,118 @@ CONTEXT_PATTERNS = {
     'comparative': [r'\bvs\b|versus|compared|budget|actual|forecast|target']
 }
 
+# Each pattern group pre-joined into one compiled alternation: one regex
+# engine entry per group per call instead of one per pattern, and no
+# per-call compile-cache lookups
+_CONCEPT_RX = {
+    concept: re.compile('|'.join(f'(?:{p})' for p in terms['patterns']))
+    for concept, terms in BUSINESS_TERMS.items()
+}
+_CONTEXT_RX = {
+    context: re.compile('|'.join(f'(?:{p})' for p in patterns), re.IGNORECASE)
+    for context, patterns in CONTEXT_PATTERNS.items()
+}
+
+# Keyword sets for the special-case checks at the end of classification;
+# probing a tokenized text against these avoids rebuilding the hard-coded
+# lists and scanning the full text per term on every call
+_WORD_RX = re.compile(r'\w+')
+_PLANNING_TERMS = frozenset({'budget', 'actual', 'forecast', 'target'})
+_BENCHMARK_TERMS = frozenset({'benchmark', 'industry', 'peer', 'competitor'})
+
+
+# Compound business terms and the category each one implies
+_COMPOUND_TERMS = [
+    ('gross profit', 'profitability'),
+    ('net profit', 'profitability'),
+    ('operating profit', 'profitability'),
+    ('profit margin', 'profitability'),
+    ('gross margin', 'profitability'),
+    ('net margin', 'profitability'),
+    ('total revenue', 'revenue'),
+    ('net revenue', 'revenue'),
+    ('sales revenue', 'revenue'),
+    ('operating expense', 'cost'),
+    ('cost of goods sold', 'cost'),
+    ('return on investment', 'efficiency'),
+    ('return on equity', 'efficiency'),
+    ('working capital', 'liquidity'),
+    ('cash flow', 'liquidity')
+]
+
+
+def _build_term_automaton():
+    """Build one automaton over every primary term, synonym, and compound.
+
+    A single linear pass over a row text then finds all dictionary hits at
+    once, instead of one substring scan per keyword per concept; a term
+    shared by several concepts ('turnover', 'income') maps to all of them.
+    """
+    if not AHOCORASICK_AVAILABLE:
+        return None
+    term_categories = {}
+    for concept, terms in BUSINESS_TERMS.items():
+        for term in terms['primary'] + terms['synonyms']:
+            term_categories.setdefault(term, set()).add(concept)
+    for term, category in _COMPOUND_TERMS:
+        term_categories.setdefault(term, set()).add(category)
+    automaton = ahocorasick.Automaton()
+    for term, categories in term_categories.items():
+        automaton.add_word(term, frozenset(categories))
+    automaton.make_automaton()
+    return automaton
+
+
+_TERM_AUTOMATON = _build_term_automaton()
+
+
+def _build_compound_automaton():
+    """Automaton over just the compound terms, for extract_business_synonyms."""
+    if not AHOCORASICK_AVAILABLE:
+        return None
+    automaton = ahocorasick.Automaton()
+    for term, category in _COMPOUND_TERMS:
+        automaton.add_word(term, category)
+    automaton.make_automaton()
+    return automaton
+
+
+_COMPOUND_AUTOMATON = _build_compound_automaton()
+
 
 def extract_business_synonyms(text: str) -> Set[str]:
     """Extract business synonyms and related terms from text."""
     text_lower = text.lower()
+
+    # One pass over the text finds every compound term at once
+    if _COMPOUND_AUTOMATON is not None:
+        return {category for _, category in _COMPOUND_AUTOMATON.iter(text_lower)}
+
     synonyms = set()
-    
-    # Check for compound terms first
-    compound_terms = [
-        ('gross profit', 'profitability'),
-        ('net profit', 'profitability'), 
-        ('operating profit', 'profitability'),
-        ('profit margin', 'profitability'),
-        ('gross margin', 'profitability'),
-        ('net margin', 'profitability'),
-        ('total revenue', 'revenue'),
-        ('net revenue', 'revenue'),
-        ('sales revenue', 'revenue'),
-        ('operating expense', 'cost'),
-        ('cost of goods sold', 'cost'),
-        ('return on investment', 'efficiency'),
-        ('return on equity', 'efficiency'),
-        ('working capital', 'liquidity'),
-        ('cash flow', 'liquidity')
-    ]
-    
-    for term, category in compound_terms:
+    for term, category in _COMPOUND_TERMS:
         if term in text_lower:
             synonyms.add(category)
-    
+
     return synonyms
 
 
-def classify_by_formula(formula_info: Dict) -> List[str]:
+def classify_by_formula(formula_info: Dict) -> Tuple[str, ...]:
     """Classify metrics based on formula analysis."""
     categories = []
-    
+
     if not formula_info:
-        return categories
-    
-    functions = formula_info.get('functions', [])
-    operations = formula_info.get('operations', [])
-    
+        return ()
+
+    # Lowercase the extracted functions once; every category check is then
+    # a set intersection instead of rebuilding a lowered list per category
+    functions = {f.lower() for f in formula_info.get('functions', [])}
+    operations = set(formula_info.get('operations', []))
+
     # Function-based classification
-    for func_category, func_list in FORMULA_FUNCTIONS.items():
-        if any(func.lower() in [f.lower() for f in functions] for func in func_list):
+    for func_category, func_set in _FORMULA_FUNCTIONS_LOWER.items():
+        if functions & func_set:
             categories.append(f'formula_{func_category}')
-    
+
     # Operation-based classification
     if 'division' in operations:
         categories.append('ratio_calculation')
@@ -113,62 +192,94 @@ def classify_by_formula(formula_info: Dict) -> List[str]:
         categories.append('variance_calculation')
     if 'multiplication' in operations:
         categories.append('scaling_calculation')
-    
-    return categories
 
+    return tuple(categories)
+
+
+@functools.lru_cache(maxsize=4096)
+def _classify_text(text: str) -> tuple:
+    """Classify the text-only signals, memoized on the lowered row text.
+
+    Spreadsheets repeat row content heavily (empty cells, repeated labels,
+    identical category rows), so duplicate texts skip the scans entirely.
+    BUSINESS_TERMS and the compiled tables are frozen after import, which
+    makes the cache safe.
+    """
+    # A set from the start: duplicates never accumulate, and the sorted
+    # tuple return gives every equal input an identical, stable value
+    categories = set()
+
+    if _TERM_AUTOMATON is not None:
+        # One linear pass covers every primary term, synonym, and
+        # compound term at once
+        for _, term_categories in _TERM_AUTOMATON.iter(text):
+            categories.update(term_categories)
+        # Regex patterns still catch what the word lists miss
+        for concept, concept_rx in _CONCEPT_RX.items():
+            if concept not in categories and concept_rx.search(text):
+                categories.add(concept)
+    else:
+        # Primary business concept classification
+        for concept, terms in BUSINESS_TERMS.items():
+            # Check primary terms
+            if any(term in text for term in terms['primary']):
+                categories.add(concept)
+
+            # Check synonyms
+            elif any(synonym in text for synonym in terms['synonyms']):
+                categories.add(concept)
+
+            # Check regex patterns
+            elif _CONCEPT_RX[concept].search(text):
+                categories.add(concept)
+
+        # Extract compound business synonyms
+        categories |= extract_business_synonyms(text)
 
-def classify_metric(row_text: str, formula_info: Dict = None, column_types: Dict = None) -> List[str]:
-    """Enhanced metric classification with business context understanding."""
-    text = row_text.lower()
-    categories = []
-    
-    # Primary business concept classification
-    for concept, terms in BUSINESS_TERMS.items():
-        # Check primary terms
-        if any(term in text for term in terms['primary']):
-            categories.append(concept)
-        
-        # Check synonyms
-        elif any(synonym in text for synonym in terms['synonyms']):
-            categories.append(concept)
-        
-        # Check regex patterns
-        elif any(re.search(pattern, text) for pattern in terms['patterns']):
-            categories.append(concept)
-    
-    # Extract compound business synonyms
-    compound_categories = extract_business_synonyms(text)
-    categories.extend(list(compound_categories))
-    
     # Context-based classification
-    for context, patterns in CONTEXT_PATTERNS.items():
-        if any(re.search(pattern, text, re.IGNORECASE) for pattern in patterns):
-            categories.append(context)
-    
+    for context, context_rx in _CONTEXT_RX.items():
+        if context_rx.search(text):
+            categories.add(context)
+
+    # Special business logic classifications
+    text_tokens = frozenset(_WORD_RX.findall(text))
+    if not _PLANNING_TERMS.isdisjoint(text_tokens):
+        categories.add('planning_metrics')
+
+    if not _BENCHMARK_TERMS.isdisjoint(text_tokens):
+        categories.add('benchmark_analysis')
+
+    return tuple(sorted(categories))
+
+
+def classify_metric(row_text: str, formula_info: Dict = None, column_types: Dict = None) -> Tuple[str, ...]:
+    """Enhanced metric classification with business context understanding."""
+    # Text-derived categories come from the memoized scan; the formula and
+    # column-type inputs vary independently, so they are merged here
+    categories = set(_classify_text(row_text.lower()))
+
     # Formula-based classification
     if formula_info:
-        formula_categories = classify_by_formula(formula_info)
-        categories.extend(formula_categories)
-    
+        categories.update(classify_by_formula(formula_info))
+
     # Column type-based classification
     if column_types:
         for col_type in column_types.values():
             if col_type in ['percentage', 'currency', 'ratio']:
-                categories.append(col_type)
-    
-    # Special business logic classifications
-    if any(term in text for term in ['budget', 'actual', 'forecast', 'target']):
-        categories.append('planning_metrics')
-    
-    if any(term in text for term in ['benchmark', 'industry', 'peer', 'competitor']):
-        categories.append('benchmark_analysis')
-    
-    # Remove duplicates and return
-    return list(set(categories))
+                categories.add(col_type)
+
+    # Sorted tuple: equal inputs always produce the same, hashable value
+    return tuple(sorted(categories))
 
 
+@functools.cache
 def get_business_concept_hierarchy() -> Dict[str, List[str]]:
-    """Return hierarchical business concept relationships."""
+    """Return hierarchical business concept relationships.
+
+    The hierarchy is static, so the dict is built once and memoized;
+    ingest calls this per row and the query processor at startup, and
+    all of them share the same instance. Callers must not mutate it.
+    """
     return {
         'financial_performance': ['profitability', 'revenue', 'cost', 'efficiency'],
         'growth_metrics': ['growth', 'variance_calculation', 'time_series'],
@@ -178,8 +289,14 @@ def get_business_concept_hierarchy() -> Dict[str, List[str]]:
     }
 
 
-def explain_classification(categories: List[str], row_text: str) -> str:
-    """Provide human-readable explanation of why content was classified."""
+@functools.lru_cache(maxsize=4096)
+def explain_classification(categories: Tuple[str, ...], row_text: str) -> str:
+    """Provide human-readable explanation of why content was classified.
+
+    Memoized: categories arrive as the sorted tuple classify_metric
+    produces, so rows with identical text and tags share one explanation
+    build.
+    """
     if not categories:
         return "No specific business classification found."
     
@@ -1,8 +1,13 @@
+import csv
+import functools
+import io
+import numpy as np
 import pandas as pd
 import re
 import json
 from typing import Dict, List, Any
 from fastapi import HTTPException, UploadFile
+from langchain.schema import Document
 from tagging import classify_metric, explain_classification, get_business_concept_hierarchy
 
 # Optional magic import for MIME type detection
@@ -12,6 +17,16 @@ try:
 except ImportError:
     MAGIC_AVAILABLE = False
 
+# orjson serializes the small per-row metadata dicts several times faster
+# than stdlib json; fall back transparently when it isn't installed
+try:
+    import orjson
+
+    def _json_dumps(obj) -> str:
+        return orjson.dumps(obj).decode()
+except ImportError:
+    _json_dumps = json.dumps
+
 
 def detect_column_types(df: pd.DataFrame) -> Dict[str, str]:
     """Detect column types for better business context understanding."""
@@ -21,11 +36,22 @@ def detect_column_types(df: pd.DataFrame) -> Dict[str, str]:
         col_lower = col.lower()
         sample_values = df[col].dropna().astype(str)
 
+        # Decode the column's strings into one array and scan it once per
+        # marker character; each .str.contains call was a full pandas pass
+        # allocating a fresh boolean Series
+        if len(sample_values) > 0:
+            arr = np.asarray(sample_values, dtype=np.str_)
+            percentage_values = int((np.char.find(arr, '%') >= 0).sum())
+            has_formula = bool((np.char.find(arr, '=') >= 0).any())
+            has_dollar = bool((np.char.find(arr, '$') >= 0).any())
+        else:
+            percentage_values = 0
+            has_formula = False
+            has_dollar = False
+
         # First check data type - if it's string/object, it's likely categorical unless proven otherwise
         if df[col].dtype in ['object', 'string']:
             # For string columns, only classify as special types if there are strong indicators
-            percentage_values = sample_values.str.contains(
-                '%').sum() if len(sample_values) > 0 else 0
             mostly_percentages = percentage_values > len(
                 sample_values) * 0.5  # More than 50% contain %
 
@@ -34,20 +60,24 @@ def detect_column_types(df: pd.DataFrame) -> Dict[str, str]:
                 column_types[col] = 'percentage'
             elif 'date' in col_lower or 'year' in col_lower or 'month' in col_lower or 'quarter' in col_lower:
                 column_types[col] = 'date'
-            elif sample_values.str.contains('=').any():
+            elif has_formula:
                 column_types[col] = 'formula'
             else:
                 column_types[col] = 'categorical'
 
         # For numeric columns, apply business logic
         elif df[col].dtype in ['float64', 'int64']:
+            # min/max computed once per column
+            col_max = df[col].max()
+            col_min = df[col].min()
+
             # Check for percentage columns (numeric values between 0-1 or 0-100)
-            if (df[col].max() <= 1.0 and df[col].min() >= 0) or 'percent' in col_lower:
+            if (col_max <= 1.0 and col_min >= 0) or 'percent' in col_lower:
                 column_types[col] = 'percentage'
             # Check for currency/monetary columns
             elif ('amount' in col_lower or 'price' in col_lower or 'cost' in col_lower or
                   'revenue' in col_lower or 'income' in col_lower or 'profit' in col_lower or
-                  'expense' in col_lower or sample_values.str.contains('$').any()):
+                  'expense' in col_lower or has_dollar):
                 column_types[col] = 'currency'
             # Check for ratio columns
             elif ('ratio' in col_lower or 'turnover' in col_lower or 'roi' in col_lower or 'roe' in col_lower):
@@ -62,6 +92,18 @@ def detect_column_types(df: pd.DataFrame) -> Dict[str, str]:
     return column_types
 
 
+# Compiled once; per-call re.findall re-parsed this pattern every time
+_FORMULA_FUNCS_RE = re.compile(
+    r'\b(SUM|AVERAGE|COUNT|IF|VLOOKUP|INDEX|MATCH|SUMIF|COUNTIF)\b')
+
+_OPERATOR_NAMES = (
+    ('+', 'addition'),
+    ('-', 'subtraction'),
+    ('*', 'multiplication'),
+    ('/', 'division'),
+)
+
+
 def extract_formula_info(value: str) -> Dict[str, Any]:
     """Extract information from formula strings."""
     if not isinstance(value, str) or not value.startswith('='):
@@ -70,123 +112,155 @@ def extract_formula_info(value: str) -> Dict[str, Any]:
     formula_info = {'raw_formula': value}
 
     # Common function patterns
-    functions = re.findall(
-        r'\b(SUM|AVERAGE|COUNT|IF|VLOOKUP|INDEX|MATCH|SUMIF|COUNTIF)\b', value.upper())
+    functions = _FORMULA_FUNCS_RE.findall(value.upper())
     if functions:
         formula_info['functions'] = functions
 
-    # Mathematical operations
-    operations = []
-    if '+' in value:
-        operations.append('addition')
-    if '-' in value:
-        operations.append('subtraction')
-    if '*' in value:
-        operations.append('multiplication')
-    if '/' in value:
-        operations.append('division')
+    # Mathematical operations: one pass over the formula's characters
+    # instead of a substring scan per operator
+    present = set(value)
+    operations = [name for op, name in _OPERATOR_NAMES if op in present]
     if operations:
         formula_info['operations'] = operations
 
     return formula_info
 
 
-def create_business_context(col_name: str, value: Any, col_type: str) -> str:
-    """Create business context description for a column-value pair."""
-    col_lower = col_name.lower()
+# Keyword groups for the column-context dispatch, built once instead of
+# per call
+_REVENUE_COL_TERMS = ('revenue', 'sales', 'income')
+_COST_COL_TERMS = ('cost', 'expense', 'overhead')
+_PROFIT_COL_TERMS = ('profit', 'margin', 'ebitda')
+_GROWTH_COL_TERMS = ('growth', 'change', 'increase')
+_EFFICIENCY_COL_TERMS = ('roi', 'roe', 'turnover', 'efficiency')
+_TIME_COL_TERMS = ('yr1', 'yr2', 'year', 'q1', 'q2', 'q3', 'q4', 'quarter')
 
-    # Format value based on type
-    if col_type == 'percentage':
-        if isinstance(value, (int, float)):
-            if value <= 1.0:
-                formatted_value = f"{value:.1%}"
-            else:
-                formatted_value = f"{value}%"
-        else:
-            formatted_value = str(value)
-    elif col_type == 'currency':
-        if isinstance(value, (int, float)):
-            formatted_value = f"${value:,.0f}"
-        else:
-            formatted_value = str(value)
-    else:
-        formatted_value = str(value)
 
-    # Add business context
+@functools.lru_cache(maxsize=256)
+def _column_context_suffix(col_lower: str) -> str:
+    """Resolve the business-context suffix for a column name.
+
+    The suffix depends only on the column name, yet it was being rebuilt
+    for every cell; memoizing makes it one dispatch per distinct column.
+    """
     context_parts = []
 
     # Revenue-related context
-    if any(term in col_lower for term in ['revenue', 'sales', 'income']):
+    if any(term in col_lower for term in _REVENUE_COL_TERMS):
         context_parts.append('revenue metric')
 
     # Cost-related context
-    elif any(term in col_lower for term in ['cost', 'expense', 'overhead']):
+    elif any(term in col_lower for term in _COST_COL_TERMS):
         context_parts.append('cost metric')
 
     # Profitability context
-    elif any(term in col_lower for term in ['profit', 'margin', 'ebitda']):
+    elif any(term in col_lower for term in _PROFIT_COL_TERMS):
         context_parts.append('profitability metric')
 
     # Growth context
-    elif any(term in col_lower for term in ['growth', 'change', 'increase']):
+    elif any(term in col_lower for term in _GROWTH_COL_TERMS):
         context_parts.append('growth metric')
 
     # Efficiency context
-    elif any(term in col_lower for term in ['roi', 'roe', 'turnover', 'efficiency']):
+    elif any(term in col_lower for term in _EFFICIENCY_COL_TERMS):
         context_parts.append('efficiency metric')
 
     # Time context
-    if any(term in col_lower for term in ['yr1', 'yr2', 'year', 'q1', 'q2', 'q3', 'q4', 'quarter']):
+    if any(term in col_lower for term in _TIME_COL_TERMS):
         context_parts.append('time-series data')
 
     if context_parts:
-        context_desc = f" ({', '.join(context_parts)})"
-    else:
-        context_desc = ""
-
-    return f"{col_name}: {formatted_value}{context_desc}"
+        return f" ({', '.join(context_parts)})"
+    return ""
 
 
-def dataframe_to_documents(df: pd.DataFrame) -> List[Dict]:
-    """Convert DataFrame to documents with enhanced business context."""
-    from langchain.schema import Document
+def _format_value(value: Any, col_type: str) -> str:
+    """Format a cell value according to its detected column type."""
+    if col_type == 'percentage':
+        if isinstance(value, (int, float)):
+            if value <= 1.0:
+                return f"{value:.1%}"
+            return f"{value}%"
+    elif col_type == 'currency':
+        if isinstance(value, (int, float)):
+            return f"${value:,.0f}"
+    return str(value)
 
-    # Detect column types
-    column_types = detect_column_types(df)
 
-    docs = []
-    for i, row in df.iterrows():
+def create_business_context(col_name: str, value: Any, col_type: str) -> str:
+    """Create business context description for a column-value pair."""
+    suffix = _column_context_suffix(col_name.lower())
+    return f"{col_name}: {_format_value(value, col_type)}{suffix}"
+
+
+def _iter_row_texts(df: pd.DataFrame, column_types: Dict[str, str]):
+    """Yield (row_index, row_text, formula_info) for every DataFrame row.
+
+    Shared row-assembly core: the loop-invariant column data is computed
+    once and the null check per cell is a C-level boolean load from one
+    vectorized notna pass instead of a pd.notnull call per element.
+    """
+    cols = df.columns.tolist()
+    col_types = [column_types.get(col, 'text') for col in cols]
+    # The context suffix depends only on the column name, so resolve it
+    # once per column rather than once per cell
+    col_suffixes = [_column_context_suffix(col.lower()) for col in cols]
+    notna_mat = df.notna().to_numpy()
+    values = df.to_numpy(dtype=object)
+
+    for i, mask, row_values in zip(df.index, notna_mat, values):
         # Create enhanced row text with business context
         row_parts = []
         formula_info = {}
 
-        for col in df.columns:
-            if pd.notnull(row[col]):
-                col_type = column_types.get(col, 'text')
-
+        for col, col_type, suffix, present, value in zip(
+                cols, col_types, col_suffixes, mask, row_values):
+            if present:
                 # Extract formula information if present
                 if col_type == 'formula':
-                    formula_info[col] = extract_formula_info(str(row[col]))
+                    formula_info[col] = extract_formula_info(str(value))
 
                 # Create business context description
-                context_desc = create_business_context(col, row[col], col_type)
-                row_parts.append(context_desc)
+                row_parts.append(
+                    f"{col}: {_format_value(value, col_type)}{suffix}")
+
+        yield i, ", ".join(row_parts), formula_info
+
+
+def dataframe_to_rowtexts(df: pd.DataFrame) -> List[tuple]:
+    """Return lightweight (row_text, row_index) tuples for every row.
+
+    Fast path for consumers that only need the text (keyword scans,
+    embedding batches): skips classification, metadata assembly, and
+    Document construction entirely.
+    """
+    column_types = detect_column_types(df)
+    return [(row_text, i) for i, row_text, _ in _iter_row_texts(df, column_types)]
+
 
-        # Create the main text
-        row_text = ", ".join(row_parts)
+def dataframe_to_documents(df: pd.DataFrame) -> List[Dict]:
+    """Convert DataFrame to documents with enhanced business context."""
+    # Detect column types; everything loop-invariant is computed once
+    column_types = detect_column_types(df)
+    column_types_json = _json_dumps({col: column_types[col] for col in df.columns})
+    hierarchy_json = _json_dumps(get_business_concept_hierarchy())
 
+    docs = []
+    for i, row_text, formula_info in _iter_row_texts(df, column_types):
         # Classify the row using enhanced tagging system
         row_categories = classify_metric(row_text, formula_info, column_types)
 
-        # Enhanced metadata - use JSON for safe parsing
+        # Enhanced metadata - use JSON for safe parsing. Categories are
+        # sorted so rows sharing a classification produce identical JSON
+        # strings (deterministic, and cache-friendly at query time).
         metadata = {
             "row_index": i,
-            "column_types_json": json.dumps({col: column_types[col] for col in df.columns}),
-            "formula_info_json": json.dumps(formula_info) if formula_info else "{}",
-            "categories_json": json.dumps(row_categories),
-            "business_concepts_json": json.dumps(list(set(row_categories))),
+            "column_types_json": column_types_json,
+            "formula_info_json": _json_dumps(formula_info) if formula_info else "{}",
+            "categories_json": _json_dumps(sorted(row_categories)),
+            "business_concepts_json": _json_dumps(sorted(set(row_categories))),
             "classification_explanation": explain_classification(row_categories, row_text),
-            "business_hierarchy_json": json.dumps(get_business_concept_hierarchy())
+            "business_hierarchy_json": hierarchy_json
         }
 
         docs.append(Document(page_content=row_text, metadata=metadata))
@@ -196,9 +270,8 @@ def dataframe_to_documents(df: pd.DataFrame) -> List[Dict]:
 
 def explain_relevance(query_analysis, doc_categories, doc_content):
     """Generate explanation for why this result is relevant to the query."""
-    extracted_concepts = query_analysis.get('extracted_concepts', [])
-    query_type = query_analysis.get('categorization', {}).get(
-        'primary_category', 'unknown')
+    extracted_concepts = query_analysis.extracted_concepts
+    query_type = query_analysis.categorization.primary_category
 
     # Find matching concepts
     matching_concepts = [
@@ -213,24 +286,32 @@ def explain_relevance(query_analysis, doc_categories, doc_content):
         return f"Text similarity match with your query (content: {doc_content[:50]}...)"
 
 
+# Characters never allowed in an uploaded filename
+_DANGEROUS_FILENAME_CHARS = frozenset('<>:"|?*\\/')
+
+
 async def validate_csv_file(file: UploadFile):
     """Comprehensive CSV file validation for security and performance."""
-    
+
     # 1. File size validation (10MB limit)
     MAX_FILE_SIZE = 10 * 1024 * 1024  # 10MB in bytes
+    HEAD_CAP = 4096  # all later checks only ever look at the head
     file_size = 0
-    contents = b''
-    
-    # Read file in chunks to check size without loading everything
+    head = bytearray()
+
+    # Read file in chunks to check size without loading everything. Only
+    # the first few KB are kept: accumulating full contents with bytes
+    # concatenation was quadratic and held the whole upload in memory.
     while chunk := await file.read(8192):  # 8KB chunks
         file_size += len(chunk)
-        contents += chunk
+        if len(head) < HEAD_CAP:
+            head.extend(chunk[:HEAD_CAP - len(head)])
         if file_size > MAX_FILE_SIZE:
             raise HTTPException(
                 status_code=413,
                 detail=f"File too large. Maximum size is {MAX_FILE_SIZE // (1024*1024)}MB"
             )
-    
+
     # Reset file pointer for later reading
     await file.seek(0)
     
@@ -245,9 +326,9 @@ async def validate_csv_file(file: UploadFile):
             detail="Only CSV files are supported"
         )
     
-    # Sanitize filename (remove dangerous characters)
-    dangerous_chars = ['<', '>', ':', '"', '|', '?', '*', '\\', '/']
-    if any(char in file.filename for char in dangerous_chars):
+    # Sanitize filename (remove dangerous characters): one hashing pass
+    # over the filename instead of a substring scan per character
+    if _DANGEROUS_FILENAME_CHARS.intersection(file.filename):
         raise HTTPException(
             status_code=400,
             detail="Filename contains invalid characters"
@@ -256,7 +337,7 @@ async def validate_csv_file(file: UploadFile):
     # 3. MIME type validation (optional, if magic is available)
     if MAGIC_AVAILABLE:
         try:
-            mime_type = magic.from_buffer(contents[:1024], mime=True)
+            mime_type = magic.from_buffer(bytes(head[:1024]), mime=True)
             allowed_mime_types = ['text/csv', 'text/plain', 'application/csv']
             if mime_type not in allowed_mime_types:
                 raise HTTPException(
@@ -270,24 +351,39 @@ async def validate_csv_file(file: UploadFile):
     # 4. Content validation - ensure it's actually CSV-like
     try:
         # Try to read first few lines as CSV
-        content_str = contents.decode('utf-8')[:1000]  # First 1000 chars
-        lines = content_str.split('\n')[:5]  # First 5 lines
-        
+        try:
+            content_str = bytes(head).decode('utf-8')
+        except UnicodeDecodeError as decode_err:
+            # A multi-byte character split at the head boundary is not an
+            # encoding problem; anything earlier in the buffer is
+            if file_size > len(head) and decode_err.start >= len(head) - 3:
+                content_str = head[:decode_err.start].decode('utf-8')
+            else:
+                raise
+        content_str = content_str[:1000]  # First 1000 chars
+
         # Basic CSV structure check
-        if len(lines) < 2:
+        if len(content_str.split('\n')) < 2:
             raise HTTPException(
                 status_code=400,
                 detail="File must contain at least a header and one data row"
             )
-        
+
+        # Parse the header with the csv module: a quoted field containing
+        # commas miscounts under a naive split(',')
+        try:
+            dialect = csv.Sniffer().sniff(content_str, delimiters=',;\t')
+        except csv.Error:
+            dialect = csv.excel
+        header = next(csv.reader(io.StringIO(content_str), dialect), [])
+
         # Check for reasonable number of columns (between 1-100)
-        first_line_columns = len(lines[0].split(','))
-        if first_line_columns < 1 or first_line_columns > 100:
+        if len(header) < 1 or len(header) > 100:
             raise HTTPException(
                 status_code=400,
                 detail="Invalid CSV structure: too few or too many columns"
             )
-            
+
     except UnicodeDecodeError:
         raise HTTPException(
             status_code=400,
@@ -300,9 +396,98 @@ async def validate_csv_file(file: UploadFile):
         )
 
 
+# Anything outside printable ASCII plus common whitespace is stripped;
+# one C-level sub replaces the per-character Python filter
+_DISALLOWED_RE = re.compile(r'[^ -~\t\n\r\x0b\x0c]')
+
+_SUSPICIOUS_PATTERNS = (
+    # Prompt injection patterns
+    'ignore previous instructions',
+    'ignore above',
+    'ignore all previous',
+    'system prompt',
+    'you are now',
+    'pretend to be',
+    'act as if',
+    'new instructions:',
+    'override previous',
+
+    # Code execution patterns
+    'execute',
+    'run command',
+    'exec(',
+    'eval(',
+    'system(',
+    '__import__',
+    'subprocess',
+    'os.system',
+    'shell',
+    'bash',
+    'cmd',
+
+    # Script injection patterns
+    '<script',
+    '</script>',
+    'javascript:',
+    'data:text/html',
+    'vbscript:',
+    'onclick',
+    'onerror',
+    'onload',
+
+    # SQL injection patterns
+    'union select',
+    'drop table',
+    'delete from',
+    'insert into',
+    'update set',
+    '--',
+    '/*',
+    '*/',
+    'or 1=1',
+    'and 1=1',
+
+    # File system patterns
+    '../',
+    '..\\',
+    '/etc/passwd',
+    '/etc/shadow',
+    'c:\\windows',
+
+    # Network patterns
+    'http://',
+    'https://',
+    'ftp://',
+    'file://',
+    'smtp://'
+)
+
+# All suspicious patterns fused into one compiled alternation: a single
+# scan of the query instead of one substring pass per pattern
+_SUSPICIOUS_RE = re.compile('|'.join(re.escape(p) for p in _SUSPICIOUS_PATTERNS))
+
+# Optional Aho-Corasick automaton over the same patterns: O(query length)
+# regardless of how many patterns the blocklist grows to
+try:
+    import ahocorasick
+
+    _SUSPICIOUS_AC = ahocorasick.Automaton()
+    for _pattern in _SUSPICIOUS_PATTERNS:
+        _SUSPICIOUS_AC.add_word(_pattern, _pattern)
+    _SUSPICIOUS_AC.make_automaton()
+except ImportError:
+    _SUSPICIOUS_AC = None
+
+
+def _contains_suspicious(query_lower: str) -> bool:
+    if _SUSPICIOUS_AC is not None:
+        return next(_SUSPICIOUS_AC.iter(query_lower), None) is not None
+    return _SUSPICIOUS_RE.search(query_lower) is not None
+
+
 def sanitize_query_input(query_text: str, max_length: int = 500) -> str:
     """Sanitize and validate user query input for security."""
-    
+
     if not query_text:
         raise HTTPException(
             status_code=400,
@@ -318,86 +503,18 @@ def sanitize_query_input(query_text: str, max_length: int = 500) -> str:
     
     # 2. Remove potentially dangerous characters
     # Allow alphanumeric, spaces, basic punctuation for business queries
-    import string
-    allowed_chars = string.ascii_letters + string.digits + string.punctuation + string.whitespace
-    
-    # Remove any non-printable characters
-    sanitized = ''.join(char for char in query_text if char in allowed_chars)
-    
+    sanitized = _DISALLOWED_RE.sub('', query_text)
+
     # 3. Remove excessive whitespace
     sanitized = ' '.join(sanitized.split())
-    
-    # 4. Enhanced suspicious pattern detection
-    suspicious_patterns = [
-        # Prompt injection patterns
-        'ignore previous instructions',
-        'ignore above',
-        'ignore all previous',
-        'system prompt',
-        'you are now',
-        'pretend to be',
-        'act as if',
-        'new instructions:',
-        'override previous',
-        
-        # Code execution patterns  
-        'execute',
-        'run command',
-        'exec(',
-        'eval(',
-        'system(',
-        '__import__',
-        'subprocess',
-        'os.system',
-        'shell',
-        'bash',
-        'cmd',
-        
-        # Script injection patterns
-        '<script',
-        '</script>',
-        'javascript:',
-        'data:text/html',
-        'vbscript:',
-        'onclick',
-        'onerror',
-        'onload',
-        
-        # SQL injection patterns
-        'union select',
-        'drop table',
-        'delete from',
-        'insert into',
-        'update set',
-        '--',
-        '/*',
-        '*/',
-        'or 1=1',
-        'and 1=1',
-        
-        # File system patterns
-        '../',
-        '..\\',
-        '/etc/passwd',
-        '/etc/shadow',
-        'c:\\windows',
-        
-        # Network patterns
-        'http://',
-        'https://',
-        'ftp://',
-        'file://',
-        'smtp://'
-    ]
-    
-    query_lower = sanitized.lower()
-    for pattern in suspicious_patterns:
-        if pattern in query_lower:
-            raise HTTPException(
-                status_code=400,
-                detail="Query contains potentially unsafe content"
-            )
-    
+
+    # 4. Enhanced suspicious pattern detection - one fused scan
+    if _contains_suspicious(sanitized.lower()):
+        raise HTTPException(
+            status_code=400,
+            detail="Query contains potentially unsafe content"
+        )
+
     # 5. Ensure minimum length for meaningful queries
     if len(sanitized.strip()) < 2:
         raise HTTPException(
@@ -1,29 +1,225 @@
+import functools
+import logging
+import os
+import uuid
+
+import httpx
 from langchain_openai import OpenAIEmbeddings
 from langchain_community.vectorstores import Chroma
 
-embedding_model = OpenAIEmbeddings(model="text-embedding-3-small")
+from embedding_cache import EmbeddingCache, text_hash
+from faiss_store import FAISSStore, FAISS_AVAILABLE
+from memory_store import InMemoryStore
 
 
-def get_vectorstore(docs, persist_dir="./chroma_store"):
+class CachedEmbeddings:
+    """Embeddings wrapper with a persistent sqlite cache on embed_documents.
+
+    Documents are keyed by (sha256(text), model name), so re-indexing
+    unchanged rows skips the embedding API entirely. Only the misses are
+    sent to the model, in one batched call.
+    """
+
+    def __init__(self, model):
+        self.model = model
+        self.cache = EmbeddingCache()
+
+    def embed_documents(self, texts):
+        hashes = [text_hash(t) for t in texts]
+        cached = self.cache.get_many(set(hashes), self.model.model)
+
+        # Embed each unique missing text exactly once — duplicate and
+        # templated rows are common in spreadsheets, and every repeat
+        # is a free broadcast of the first occurrence's vector.
+        misses = {}
+        for h, text in zip(hashes, texts):
+            if h not in cached and h not in misses:
+                misses[h] = text
+        if misses:
+            fresh = self.model.embed_documents(list(misses.values()))
+            self.cache.put_many(
+                list(zip(misses, fresh)), self.model.model)
+            cached.update(zip(misses, fresh))
+
+        return [cached[h] for h in hashes]
+
+    def embed_query(self, text):
+        return self.model.embed_query(text)
+
+
+@functools.lru_cache(maxsize=1)
+def _embedder():
+    """Build the shared embeddings stack on first use.
+
+    Lazy so that importing this module doesn't pay OpenAI client setup,
+    and memoized so every caller shares one client and one sqlite cache.
+    chunk_size=1000 makes langchain batch document embeddings at the API
+    maximum, and the explicit retry/timeout settings bound tail latency.
+
+    The shared httpx client keeps connections alive across embedding
+    calls, so a multi-batch ingest pays the TCP+TLS handshake once
+    instead of per request.
+    """
+    http_client = httpx.Client(
+        limits=httpx.Limits(max_keepalive_connections=32, max_connections=32),
+        timeout=30,
+    )
+    return CachedEmbeddings(OpenAIEmbeddings(
+        model="text-embedding-3-small",
+        chunk_size=1000,
+        max_retries=3,
+        request_timeout=30,
+        http_client=http_client,
+    ))
+
+
+logger = logging.getLogger("app.vector_store")
+
+# Set VECTOR_BACKEND=faiss to serve searches from the lighter FAISS
+# adapter (requires faiss-cpu), or VECTOR_BACKEND=memory for the plain
+# NumPy store — the fastest option for small corpora
+VECTOR_BACKEND = os.getenv("VECTOR_BACKEND", "chroma").lower()
+
+# HNSW settings for the Chroma collection: cosine distance matches the
+# scoring the FAISS and memory backends return, and the raised M /
+# construction_ef trade index-build time for better recall at query time
+_CHROMA_COLLECTION_METADATA = {
+    "hnsw:space": "cosine",
+    "hnsw:construction_ef": 200,
+    "hnsw:M": 32,
+}
+
+# Process-wide instance for the in-memory backend: adds are only
+# durable after persist(), so create/load must hand back the same store
+_memory_store = None
+
+
+def _get_memory_store():
+    global _memory_store
+    if _memory_store is None:
+        _memory_store = InMemoryStore(_embedder())
+    return _memory_store
+
+
+def _use_faiss():
+    return VECTOR_BACKEND == "faiss" and FAISS_AVAILABLE
+
+# Bounded cache of query-text -> embedding vector. A plain dict (insertion
+# ordered) with FIFO eviction so both the single and batched embed paths
+# can share it.
+_QUERY_EMBED_CACHE = {}
+_QUERY_EMBED_CACHE_SIZE = 2048
+
+
+def _cache_embedding(text: str, vector):
+    if len(_QUERY_EMBED_CACHE) >= _QUERY_EMBED_CACHE_SIZE:
+        _QUERY_EMBED_CACHE.pop(next(iter(_QUERY_EMBED_CACHE)))
+    _QUERY_EMBED_CACHE[text] = vector
+
+
+def embed_query_cached(text: str):
+    """Embed a query string, memoized on the raw text.
+
+    Repeated questions (common in demos and dashboards) skip the
+    embedding API call entirely on a cache hit. Callers must treat the
+    returned vector as read-only since it is shared across hits.
+    """
+    vector = _QUERY_EMBED_CACHE.get(text)
+    if vector is None:
+        vector = _embedder().embed_query(text)
+        _cache_embedding(text, vector)
+    return vector
+
+
+def embed_queries_cached(texts):
+    """Embed several query strings, batching all cache misses in one call.
+
+    One embed_documents round-trip for the misses is far cheaper than a
+    forward pass (and an API call) per term. Returns vectors in the same
+    order as `texts`.
+    """
+    misses = [t for t in texts if t not in _QUERY_EMBED_CACHE]
+    if misses:
+        for text, vector in zip(misses, _embedder().embed_documents(misses)):
+            _cache_embedding(text, vector)
+    return [embed_query_cached(t) for t in texts]
+
+
+def create_vectorstore(persist_dir="./chroma_store"):
+    """Open a vector store ready for incremental add_documents calls."""
     try:
-        print(f"Getting vectorstore for {len(docs)} documents")
-        vectordb = Chroma.from_documents(
-            documents=docs,
-            embedding=embedding_model,
-            persist_directory=persist_dir
+        if VECTOR_BACKEND == "memory":
+            return _get_memory_store()
+        if _use_faiss():
+            return FAISSStore(_embedder())
+        return Chroma(
+            persist_directory=persist_dir,
+            embedding_function=_embedder(),
+            collection_metadata=_CHROMA_COLLECTION_METADATA,
         )
+    except Exception as e:
+        logger.error("Error creating vectorstore: %s", e)
+        raise e
+
+
+def add_documents_batched(vectordb, docs):
+    """Embed a batch of documents once and hand the vectors to the store.
+
+    Pre-embedding keeps ingest at exactly one encoder round-trip per
+    batch (through the persistent cache) instead of whatever internal
+    batching the store applies, and lets Chroma skip its own embedding
+    step via the raw collection upsert.
+    """
+    if not docs:
+        return
+
+    texts = [doc.page_content for doc in docs]
+    metadatas = [doc.metadata for doc in docs]
+    vectors = _embedder().embed_documents(texts)
+
+    if hasattr(vectordb, "add_embeddings"):
+        vectordb.add_embeddings(texts, vectors, metadatas)
+    else:
+        ids = [str(uuid.uuid4()) for _ in texts]
+        vectordb._collection.upsert(
+            ids=ids, embeddings=vectors, metadatas=metadatas, documents=texts)
+
+
+def get_vectorstore(docs, persist_dir="./chroma_store"):
+    """Build a store from docs in one pre-embedded batch.
+
+    Chroma.from_documents left the embedding batching to the store's
+    internals; going through add_documents_batched embeds the whole batch
+    in one encoder round-trip (behind the persistent cache) and hands the
+    vectors over directly.
+    """
+    try:
+        if not docs:
+            # Nothing to index: reopen whatever is already persisted and
+            # skip the embedding round-trip and the synchronous persist()
+            return load_vectorstore(persist_dir)
+
+        logger.info("Getting vectorstore for %d documents", len(docs))
+        vectordb = create_vectorstore(persist_dir)
+        add_documents_batched(vectordb, docs)
         vectordb.persist()
         return vectordb
     except Exception as e:
-        print(f"Error getting vectorstore: {e}")
+        logger.error("Error getting vectorstore: %s", e)
         raise e
 
 
 def load_vectorstore(persist_dir="./chroma_store"):
     try:
+        if VECTOR_BACKEND == "memory":
+            return _get_memory_store()
+        if _use_faiss():
+            return FAISSStore(_embedder())
         return Chroma(
-            persist_directory=persist_dir, embedding_function=embedding_model
+            persist_directory=persist_dir,
+            embedding_function=_embedder(),
+            collection_metadata=_CHROMA_COLLECTION_METADATA,
         )
     except Exception as e:
-        print(f"Error loading vectorstore: {e}")
+        logger.error("Error loading vectorstore: %s", e)
         raise e